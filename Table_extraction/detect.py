@@ -8,6 +8,7 @@ Usage - sources:
                                                              vid.mp4        # video
                                                              path/          # directory
                                                              path/*.jpg     # glob
+                                                             doc.pdf        # PDF, pages rasterized at --dpi
                                                              'https://youtu.be/Zgi9g1ksQHc'  # YouTube
                                                              'rtsp://example.com/media.mp4'  # RTSP, RTMP, HTTP stream
 
@@ -39,7 +40,9 @@ if str(ROOT) not in sys.path:
 ROOT = Path(os.path.relpath(ROOT, Path.cwd()))  # relative
 
 from models.common import DetectMultiBackend
-from utils.datasets import IMG_FORMATS, VID_FORMATS, LoadImages, LoadStreams
+from models.yolo import Detect
+from utils.datasets import (IMG_FORMATS, PDF_FORMATS, VID_FORMATS, LoadBatches, LoadImages, LoadImagesPrefetch,
+                            LoadPDF, LoadRectBatches, LoadStreams)
 from utils.general import (LOGGER, check_file, check_img_size, check_imshow, check_requirements, colorstr, cv2,
                            increment_path, non_max_suppression, print_args, scale_coords, strip_optimizer, xyxy2xywh)
 from utils.plots import Annotator, colors, save_one_box
@@ -74,10 +77,18 @@ def run(
         hide_conf=False,  # hide confidences
         half=False,  # use FP16 half-precision inference
         dnn=False,  # use OpenCV DNN for ONNX inference
+        batch_size=1,  # batch size for file/dir sources
+        prefetch=0,  # images read ahead in background threads for file/dir sources, 0 to read on the main thread
+        dpi=200,  # resolution of rasterized PDF pages
+        pdf_workers=0,  # processes rasterizing PDF pages, 0 to rasterize on the main thread
+        fuse_single_class=False,  # single-class models output one fused score, NMS skips the class logic
+        rect=False,  # batches of images of similar aspect ratio, each letterboxed to its smallest rectangle
 ):
     source = str(source)
     save_img = not nosave and not source.endswith('.txt')  # save inference images
     is_file = Path(source).suffix[1:] in (IMG_FORMATS + VID_FORMATS)
+    is_pdf = Path(source).suffix[1:].lower() in PDF_FORMATS or \
+        (Path(source).is_dir() and any(f.suffix[1:].lower() in PDF_FORMATS for f in Path(source).iterdir()))
     is_url = source.lower().startswith(('rtsp://', 'rtmp://', 'http://', 'https://'))
     webcam = source.isnumeric() or source.endswith('.txt') or (is_url and not is_file)
     if is_url and is_file:
@@ -92,6 +103,13 @@ def run(
     model = DetectMultiBackend(weights, device=device, dnn=dnn, data=data, fp16=half)
     stride, names, pt = model.stride, model.names, model.pt
     imgsz = check_img_size(imgsz, s=stride)  # check image size
+    if fuse_single_class:  # single-class Detect outputs one obj_conf * cls_conf score per anchor, see Detect.fused
+        detect = [m for m in model.model.modules() if isinstance(m, Detect)] if pt else []
+        if detect and all(m.nc == 1 for m in detect):
+            for m in detect:
+                m.fused = True
+        else:
+            LOGGER.warning('WARNING: --fuse-single-class requires a single-class PyTorch model, ignoring')
 
     # Dataloader
     if webcam:
@@ -99,17 +117,47 @@ def run(
         cudnn.benchmark = True  # set True to speed up constant image size inference
         dataset = LoadStreams(source, img_size=imgsz, stride=stride, auto=pt)
         bs = len(dataset)  # batch_size
+    elif is_pdf:
+        dataset = LoadPDF(source, img_size=imgsz, stride=stride, auto=pt, dpi=dpi, workers=pdf_workers)
+        bs = 1  # batch_size
+        if dataset.skipped:
+            LOGGER.warning(f'WARNING: reading the PDFs of {source} only, {dataset.skipped} images/videos are ignored')
+        if prefetch > 0:
+            LOGGER.warning('WARNING: --prefetch is not supported for PDFs, use --pdf-workers to render ahead')
+        if rect:
+            LOGGER.warning('WARNING: --rect is not supported for PDFs, ignoring')
+        if batch_size > 1:
+            dataset = LoadBatches(dataset, batch_size=batch_size)
+            bs = batch_size
+    elif rect and pt:
+        dataset = LoadRectBatches(source, img_size=imgsz, stride=stride, batch_size=batch_size)
+        bs = batch_size
+        if prefetch > 0:
+            LOGGER.warning('WARNING: --prefetch is not supported with --rect, reading on the main thread')
     else:
-        dataset = LoadImages(source, img_size=imgsz, stride=stride, auto=pt)
+        if rect:
+            LOGGER.warning(f'WARNING: --rect requires a PyTorch model, letterboxing to --imgsz {imgsz}')
+        if prefetch > 0:  # reads on the main thread for videos
+            dataset = LoadImagesPrefetch(source, img_size=imgsz, stride=stride, auto=pt, prefetch=prefetch,
+                                         pin_memory=device.type != 'cpu')
+        else:
+            dataset = LoadImages(source, img_size=imgsz, stride=stride, auto=pt)
         bs = 1  # batch_size
+        if batch_size > 1 and any(dataset.video_flag):
+            LOGGER.warning('WARNING: --batch-size is only supported for images, using batch size 1')
+        elif batch_size > 1:
+            dataset = LoadBatches(dataset, batch_size=batch_size)
+            bs = batch_size
+    batched = isinstance(dataset, (LoadBatches, LoadRectBatches))
     vid_path, vid_writer = [None] * bs, [None] * bs
 
     # Run inference
     model.warmup(imgsz=(1 if pt else bs, 3, *imgsz))  # warmup
     dt, seen = [0.0, 0.0, 0.0], 0
     for path, im, im0s, vid_cap, s in dataset:
+        strings = s  # per image for batches
         t1 = time_sync()
-        im = torch.from_numpy(im).to(device)
+        im = im.to(device, non_blocking=True) if isinstance(im, torch.Tensor) else torch.from_numpy(im).to(device)
         im = im.half() if model.fp16 else im.float()  # uint8 to fp16/32
         im /= 255  # 0 - 255 to 0.0 - 1.0
         if len(im.shape) == 3:
@@ -118,13 +166,14 @@ def run(
         dt[0] += t2 - t1
 
         # Inference
-        visualize = increment_path(save_dir / Path(path).stem, mkdir=True) if visualize else False
+        stem = Path(path[0] if batched else path).stem
+        visualize = increment_path(save_dir / stem, mkdir=True) if visualize else False
         pred = model(im, augment=augment, visualize=visualize)
         t3 = time_sync()
         dt[1] += t3 - t2
 
         # NMS
-        pred = non_max_suppression(pred, conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det)
+        pred = non_max_suppression(pred, conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det, batched=batched)
         dt[2] += time_sync() - t3
 
         # Second-stage classifier (optional)
@@ -136,6 +185,9 @@ def run(
             if webcam:  # batch_size >= 1
                 p, im0, frame = path[i], im0s[i].copy(), dataset.count
                 s += f'{i}: '
+            elif batched:  # batch of images
+                p, im0, frame = path[i], im0s[i].copy(), 0
+                s = strings[i]
             else:
                 p, im0, frame = path, im0s.copy(), getattr(dataset, 'frame', 0)
 
@@ -195,12 +247,26 @@ def run(
                         vid_writer[i] = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
                     vid_writer[i].write(im0)
 
+            if batched:
+                LOGGER.info(f'{s}Done. ({t3 - t2:.3f}s for {len(pred)} images)')
+
         # Print time (inference-only)
-        LOGGER.info(f'{s}Done. ({t3 - t2:.3f}s)')
+        if not batched:
+            LOGGER.info(f'{s}Done. ({t3 - t2:.3f}s)')
 
     # Print results
     t = tuple(x / seen * 1E3 for x in dt)  # speeds per image
-    LOGGER.info(f'Speed: %.1fms pre-process, %.1fms inference, %.1fms NMS per image at shape {(1, 3, *imgsz)}' % t)
+    if isinstance(dataset, LoadRectBatches):  # one shape per batch
+        shapes = sorted({(len(b), 3, *s) for b, s in zip(dataset.batches, dataset.batch_shapes)})
+        shape = 'shapes ' + ', '.join(map(str, shapes))
+    else:
+        shape = f'shape {(bs, 3, *imgsz)}'
+    LOGGER.info(f'Speed: %.1fms pre-process, %.1fms inference, %.1fms NMS per image at {shape}' % t)
+    loader = dataset.dataset if isinstance(dataset, LoadBatches) else dataset
+    if isinstance(loader, LoadImagesPrefetch) and loader.prefetch and seen:
+        load, wait = sum(loader.load_times) / seen * 1E3, loader.wait_time / seen * 1E3  # per image
+        LOGGER.info(f'Prefetch: %.1fms read and letterbox, %.1fms waited, %.1fms (%.0f%%) hidden per image '
+                    f'({loader.workers} workers)' % (load, wait, load - wait, 100 * (load - wait) / max(load, 1E-9)))
     if save_txt or save_img:
         s = f"\n{len(list(save_dir.glob('labels/*.txt')))} labels saved to {save_dir / 'labels'}" if save_txt else ''
         LOGGER.info(f"Results saved to {colorstr('bold', save_dir)}{s}")
@@ -236,6 +302,12 @@ def parse_opt():
     parser.add_argument('--hide-conf', default=False, action='store_true', help='hide confidences')
     parser.add_argument('--half', action='store_true', help='use FP16 half-precision inference')
     parser.add_argument('--dnn', action='store_true', help='use OpenCV DNN for ONNX inference')
+    parser.add_argument('--batch-size', type=int, default=1, help='batch size for file/dir sources')
+    parser.add_argument('--prefetch', type=int, default=0, help='images read ahead in threads for file/dir sources')
+    parser.add_argument('--dpi', type=int, default=200, help='resolution of rasterized PDF pages')
+    parser.add_argument('--pdf-workers', type=int, default=0, help='processes rasterizing PDF pages, 0 for main thread')
+    parser.add_argument('--fuse-single-class', action='store_true', help='fuse obj and cls conf of single-class models')
+    parser.add_argument('--rect', action='store_true', help='rectangular batches of images of similar aspect ratio')
     opt = parser.parse_args()
     opt.imgsz *= 2 if len(opt.imgsz) == 1 else 1  # expand
     print_args(vars(opt))
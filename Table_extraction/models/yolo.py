@@ -38,6 +38,7 @@ class Detect(nn.Module):
     stride = None  # strides computed during build
     onnx_dynamic = False  # ONNX export parameter
     export = False  # export mode
+    fused = False  # single-class inference mode, one obj_conf * cls_conf score per anchor (see forward)
 
     def __init__(self, nc=80, anchors=(), ch=(), inplace=True):  # detection layer
         super().__init__()
@@ -71,7 +72,9 @@ class Detect(nn.Module):
                     xy = (xy * 2 + self.grid[i]) * self.stride[i]  # xy
                     wh = (wh * 2) ** 2 * self.anchor_grid[i]  # wh
                     y = torch.cat((xy, wh, conf), 4)
-                z.append(y.view(bs, -1, self.no))
+                if self.fused and self.nc == 1:  # single class, x(bs,3,20,20,6) to y(bs,3,20,20,5) xywh, conf
+                    y = torch.cat((y[..., :4], y[..., 4:5] * y[..., 5:6]), 4)  # conf = obj_conf * cls_conf
+                z.append(y.view(bs, -1, y.shape[-1]))
 
         return x if self.training else (torch.cat(z, 1),) if self.export else (torch.cat(z, 1), x)
 
@@ -2,6 +2,7 @@ import cv2
 import matplotlib.pyplot as plt
 import numpy as np
 import os
+import time
 from PIL import Image
 
 
@@ -33,19 +34,132 @@ def remove_background(img=None, method='binary',thresh=150, sharpen=True, tozero
     """
     # make sure the input image is valid
     assert img is not None and method in ['binary', 'tozero', 'OTSU', 'adaptive']
-    
+
     #sharpen (not applied to adaptive shresholding)
     if sharpen and method != 'adaptive':
-        kernel = np.array([[0, -1, 0],
-                           [-1, 5,-1],
-                           [0, -1, 0]])
-        img = cv2.filter2D(src=img, ddepth=-1, kernel=kernel)
-    
+        img = _sharpen(img)
+
     #grayscale
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.shape[-1] == 3 else img
-    
+
+    thresh_values = _threshold(gray, method, thresh)
+
+    # Further process each row for images with multiple background colors
+    thresh_values = invert_dark_rows(thresh_values, method=method, thresh=thresh,
+                                     tozero_thresh=tozero_thresh)
+
+    _params = method+', shreshold='+ str(thresh) + int(sharpen)*', sharpened'
+    #return a parameter string and a binary/grayscale image with white background
+    return _params, thresh_values
+
+
+def remove_background_batch(imgs=None, method='binary',thresh=150, sharpen=True, tozero_thresh=None):
+    """
+    applies remove_background to a stack of table/cell crops and returns the
+    processed binary/grayscale images
+
+    arguments
+    -----------
+    imgs            array/list, a stack of RGB images as a numpy array with shape
+                    (n, height, width, channel), or a list of RGB images of any size
+    method          str, method of image processing, same as remove_background
+    thresh          int, range [0,255], the threshold value for binary image, default = 150
+    sharpen         bool, whether to sharpen the input images, default = True
+    tozero_thresh   tuple/list, same as remove_background, default = None
+
+    returns
+    -----------
+    _params         str, a string containing input parameter values
+    thresh_values   array/list, the processed grayscale images, as a numpy array with shape
+                    (n, height, width) if 'imgs' is an array, otherwise as a list of arrays
+
+    """
+    # make sure the input images are valid
+    assert imgs is not None and method in ['binary', 'tozero', 'OTSU', 'adaptive']
+
+    _params = method+', shreshold='+ str(thresh) + int(sharpen)*', sharpened'
+
+    # crops of different sizes cannot be stacked, process them one by one
+    if not isinstance(imgs, np.ndarray) or imgs.ndim != 4:
+        thresh_values = [remove_background(img, method=method, thresh=thresh, sharpen=sharpen,
+                                           tozero_thresh=tozero_thresh)[1] for img in imgs]
+        return _params, thresh_values
+
+    n, rows, cols = imgs.shape[:3]
+
+    #sharpen (convolution must not cross the borders between crops)
+    if sharpen and method != 'adaptive':
+        imgs = np.stack([_sharpen(img) for img in imgs])
+
+    # grayscale and binary/tozero thresholding work pixel by pixel, so the stack
+    # is processed as a single tall image
+    tall = imgs.reshape(n*rows, cols, -1)
+    gray = cv2.cvtColor(tall, cv2.COLOR_BGR2GRAY) if tall.shape[-1] == 3 else tall.reshape(n*rows, cols)
+
+    if method in ['binary', 'tozero']:
+        thresh_values = _threshold(gray, method, thresh)
+    else:
+        # OTSU and adaptive thresholds depend on the whole crop
+        gray = gray.reshape(n, rows, cols)
+        thresh_values = np.concatenate([_threshold(g, method, thresh) for g in gray])
+
+    thresh_values = invert_dark_rows(thresh_values, method=method, thresh=thresh,
+                                     tozero_thresh=tozero_thresh)
+
+    return _params, thresh_values.reshape(n, rows, cols)
+
+
+def invert_dark_rows(thresh_values, method='binary', thresh=150, tozero_thresh=None):
+    """
+    flips the colors of rows with white characters in a dark background
+
+    arguments
+    -----------
+    thresh_values   array, the thresholded image as a numpy array with shape (height, width),
+                    modified in place
+    method          str, the thresholding method used to generate 'thresh_values'
+    thresh          int, range [0,255], the threshold value used to binarize 'tozero' images
+    tozero_thresh   tuple/list, the low and high thresholds applied ONLY when method='tozero'
+
+    returns
+    -----------
+    thresh_values   array, the processed image with white background in every row
+
+    """
+    if method == 'tozero':
+        # tozero shresholding generates grayscale image instead of binary image
+        ret, binary = cv2.threshold(thresh_values, thresh, 255, cv2.THRESH_BINARY)
+        white = np.count_nonzero(binary, axis=1)
+        black = binary.shape[1] - white
+        if tozero_thresh is not None and len(tozero_thresh) == 2 :
+            l,h = tozero_thresh
+            thresh_values[thresh_values >= h] = 255
+            thresh_values[thresh_values <= l] = 0
+    else:
+        # count black and white pixels of each row
+        black = np.count_nonzero(thresh_values == 0, axis=1)
+        white = np.count_nonzero(thresh_values == 255, axis=1)
+
+    # rows without characters are skipped, rows with white characters in a dark
+    # background are inversed
+    inverse = (black > 0) & ((white == 0) | (black > white))
+    thresh_values[inverse] = 255 - thresh_values[inverse]
+
+    return thresh_values
+
+
+def _sharpen(img):
+    """sharpen an image with a 3x3 laplacian kernel"""
+    kernel = np.array([[0, -1, 0],
+                       [-1, 5,-1],
+                       [0, -1, 0]])
+    return cv2.filter2D(src=img, ddepth=-1, kernel=kernel)
+
+
+def _threshold(gray, method, thresh):
+    """threshold a grayscale image with one of the remove_background methods"""
     func = cv2.THRESH_BINARY_INV
-    
+
     if method == 'binary':
         ret, thresh_values = cv2.threshold(gray,thresh, 255, func)
     elif method == 'tozero':
@@ -54,36 +168,9 @@ def remove_background(img=None, method='binary',thresh=150, sharpen=True, tozero
         ret, thresh_values = cv2.threshold(gray, thresh, 255, cv2.THRESH_OTSU)
     elif method == 'adaptive':
         thresh_values = cv2.adaptiveThreshold(~gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, func, 5, 10)
-    
-    # Further process each row for images with multiple background colors
-    for row in range(thresh_values.shape[0]):
-        if method == 'tozero':
-            # tozero shresholding generates grayscale image instead of binary image
-            ret, r = cv2.threshold(thresh_values[row,:].reshape(-1,1),thresh,255,cv2.THRESH_BINARY)
-            # count occurrences of color values
-            unique, counts = np.unique(r.reshape(-1,), return_counts=True)
-            #thresh_values[row,:] = 0.7*r.reshape(-1,)+0.3*thresh_values[row,:]
-            if tozero_thresh is not None and len(tozero_thresh) == 2 :
-                l,h = tozero_thresh
-                thresh_values[row,:] = np.where(thresh_values[row,:] >= h, 255, thresh_values[row,:])
-                thresh_values[row,:] = np.where(thresh_values[row,:] <= l, 0, thresh_values[row,:])
-        else: 
-            #count occurrences of color values
-            unique, counts = np.unique(thresh_values[row,:], return_counts=True)
-            
-        dic = dict(zip(unique, counts))
-        
-        # if this row has no characters, skip
-        if 0 not in dic.keys(): continue    #thresh_values[row,:] = 0*thresh_values[row,:]
-        # if this row has white characters in a dark background, flip the colors
-        elif 255 not in dic.keys() or dic[0] > dic[255]:
-            # inverse colors
-            thresh_values[row,:] = 255-thresh_values[row,:]
-            
-    
-    _params = method+', shreshold='+ str(thresh) + int(sharpen)*', sharpened'
-    #return a parameter string and a binary/grayscale image with white background
-    return _params, thresh_values
+
+    return thresh_values
+
 
 def get_structure(thresh_values=None, binary=True):
     """
@@ -104,6 +191,65 @@ def get_structure(thresh_values=None, binary=True):
     # make sure the input image is valid
     assert thresh_values is not None
     
+    row, col = thresh_values.shape
+    thresh_values = np.where(thresh_values <= 150, 0, thresh_values)
+    thresh_values = np.where(thresh_values >= 200, 255, thresh_values)
+    dark = thresh_values == 0
+
+    # GET VERTICAL BORDER LINES
+    # columns with at most one black pixel
+    v_lines = np.flatnonzero(np.count_nonzero(dark, axis=0) <= 1)
+
+    # GET HORIZONTAL BORDER LINES
+    # if the row has a semi-structured/incomplete border line with length of at
+    # least 1/10 of the width, the two rows above it are completed as a line.
+    # Run lengths of black pixels over the windows [s, s+col//10) are read from
+    # the cumulative sums, with window starts s stepping by 5
+    width = col//10
+    starts = np.arange(0, col-width, 5)
+    runs = np.zeros((row, col+1), np.int32)
+    np.cumsum(dark, axis=1, dtype=np.int32, out=runs[:,1:])
+    h_lines = np.flatnonzero((runs[:,starts+width] - runs[:,starts] == width).any(axis=1))
+    h_lines = h_lines[h_lines >= 2]
+
+    zeros = np.count_nonzero(dark, axis=1)
+    structured = thresh_values.copy()
+    # if the row has characters, hide the characters with light colors
+    # (entirely black rows are skipped)
+    structured[dark & ((zeros > 0) & (zeros < col))[:,None]] = 220
+    # if the row has no characters, draw a black line 
+    structured[zeros == 0] = 0
+    structured[np.concatenate((h_lines-2, h_lines-1))] = 0
+    
+    # thicken vertical border lines to the left
+    v_lines = v_lines[v_lines >= 1] if col > 1 else v_lines
+    structured[:,np.concatenate((v_lines-1, v_lines))] = 0
+        
+    if binary:
+        ret, structured = cv2.threshold(structured, 160, 255, cv2.THRESH_BINARY)
+        
+    return structured
+
+
+def _get_structure_loop(thresh_values=None, binary=True):
+    """
+    reference row/column loop implementation of get_structure, kept for
+    check_structure
+    
+    arguments
+    -----------
+    thresh_values   array, the input binary/grayscale image as a numpy array with shape (height, width)   
+    binary          bool, force to return a binary image if binary = True, default = True
+    
+    returns
+    -----------
+    thresh_values   array, the processed image with structural lines, as a numpy array with 
+                    shape (height, width)
+    
+    """
+    # make sure the input image is valid
+    assert thresh_values is not None
+    
     row, col = thresh_values.shape
     thresh_values = np.where(thresh_values <= 150, 0, thresh_values)
     thresh_values = np.where(thresh_values >= 200, 255, thresh_values)
@@ -147,6 +293,41 @@ def get_structure(thresh_values=None, binary=True):
     return thresh_values
 
 
+def check_structure(crop_dir, method='tozero', tozero_thresh=[100,200], binary=True):
+    """
+    regression check of get_structure against the reference loop implementation
+    on a directory of cropped tables, e.g. runs/detect/exp/crops/table
+
+    arguments
+    -----------
+    crop_dir        str, directory of cropped table images
+    method          str, remove_background method applied before get_structure, default = 'tozero'
+    tozero_thresh   tuple/list, passed to remove_background, default = [100,200]
+    binary          bool, passed to get_structure, default = True
+
+    returns
+    -----------
+    mismatches      list, names of the crops whose thresh_values differ
+
+    """
+    mismatches = []
+    for f in sorted(os.listdir(crop_dir)):
+        img = cv2.imread(os.path.join(crop_dir, f))
+        if img is None:
+            continue
+        _, im = remove_background(img, method=method, tozero_thresh=tozero_thresh)
+        t0 = time.time()
+        expected = _get_structure_loop(im.copy(), binary=binary)
+        t1 = time.time()
+        result = get_structure(im.copy(), binary=binary)
+        t2 = time.time()
+        same = expected.dtype == result.dtype and np.array_equal(expected, result)
+        print("%s: %s (loop %.3f s, vectorized %.3f s)" % (f, 'OK' if same else 'MISMATCH', t1-t0, t2-t1))
+        if not same:
+            mismatches.append(f)
+    return mismatches
+
+
 
 def get_borders(structured=None, kernel0=2, kernel1=7, 
                 erode0_iter=1, erode1_iter=1, dilate0_iter=2, dilate1_iter=3,
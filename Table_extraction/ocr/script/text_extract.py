@@ -7,7 +7,7 @@ import numpy as np
 from PIL import Image, ImageFilter
 from script.ocr_preprocess import get_structure, get_borders
 
-def extract(test_file_path, output_text_path, method="table"):
+def extract(test_file_path, output_text_path, method="table", pool=None):
 	"""
     reads image of tabular data and perform ocr recognition 
     and returns recognized text result with table structure
@@ -17,6 +17,9 @@ def extract(test_file_path, output_text_path, method="table"):
 	test_file_path		string, path for input file to be recognized
 	output_text_path	string, the output path for txt file
     method          	string, ("table", "cell"), the ocr recognition mode
+    pool            	object (optional), a persistent OCR worker pool with an image_to_string(image, psm)
+    					method, e.g. pygazete.ocr.TesseractPool, to avoid starting tesseract and 
+    					reloading the language model for every call
     
     returns			
     -----------
@@ -40,7 +43,7 @@ def extract(test_file_path, output_text_path, method="table"):
 
 	if method=="table":
 		## Table-wise mode (--psm=6)
-		data = pt.image_to_string(image, lang='fintabnet_full', config='--psm 6') 
+		data = _image_to_string(image, 6, pool)
 		print(data)
 
 	elif method=="cell":
@@ -64,7 +67,7 @@ def extract(test_file_path, output_text_path, method="table"):
 			print(coord)
 			x_min, x_max, y_min, y_max = coord
 			cell_image = image[x_min:x_max, y_min:y_max]
-			row_data = pt.image_to_string(cell_image, lang='fintabnet_full', config='--psm 7') 
+			row_data = _image_to_string(cell_image, 7, pool)
 			# print(row_data)
 			rows.append(row_data)
 
@@ -75,4 +78,11 @@ def extract(test_file_path, output_text_path, method="table"):
 	with open(output_text_path, "w+") as f:
 		f.write(data)
 
-	return data
\ No newline at end of file
+	return data
+
+
+def _image_to_string(image, psm, pool=None):
+	"""OCR an image with the persistent pool if given, otherwise with a new tesseract process"""
+	if pool is not None:
+		return pool.image_to_string(image, psm=psm)
+	return pt.image_to_string(image, lang='fintabnet_full', config='--psm '+str(psm))
@@ -23,6 +23,7 @@ Requirements:
 
 Usage:
     $ python utils/benchmarks.py --weights yolov5s.pt --img 640
+    $ python utils/benchmarks.py --weights best.pt --img 640 --pages --device cpu  # square vs --rect page sizes
 """
 
 import argparse
@@ -30,7 +31,9 @@ import sys
 import time
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import torch
 
 FILE = Path(__file__).resolve()
 ROOT = FILE.parents[1]  # YOLOv5 root directory
@@ -42,7 +45,7 @@ import export
 import val
 from utils import notebook_init
 from utils.general import LOGGER, print_args
-from utils.torch_utils import select_device
+from utils.torch_utils import select_device, time_sync
 
 
 def run(
@@ -125,6 +128,44 @@ def test(
     return py
 
 
+@torch.no_grad()
+def pages(
+        weights=ROOT / 'yolov5s.pt',  # weights path
+        imgsz=640,  # inference size (pixels)
+        batch_size=1,  # batch size
+        device='',  # cuda device, i.e. 0 or 0,1,2,3 or cpu
+        half=False,  # use FP16 half-precision inference
+        sizes=((1200, 1553), (850, 1100), (1240, 1754), (1654, 2339), (1553, 1200), (1000, 1000)),  # pages (w, h)
+        n=10,  # timed batches per page size and shape
+):
+    # PyTorch inference time per page, letterboxed to a square `imgsz` vs the rectangle of detect.py --rect
+    from models.common import DetectMultiBackend
+    from utils.datasets import rect_shape
+
+    y, t = [], time.time()
+    device = select_device(device)
+    model = DetectMultiBackend(weights, device=device, fp16=half)
+    for w, h in sizes:
+        shapes = (imgsz, imgsz), rect_shape(np.array([[h, w]]), imgsz, model.stride)
+        ims = [torch.zeros((batch_size, 3, *shape), device=device) for shape in shapes]  # inputs
+        ims = [im.half() if model.fp16 else im for im in ims]
+        dt = [[], []]  # seconds per batch, square and rect interleaved so both see the same machine load
+        for i in range(n + 2):
+            for im, d in zip(ims, dt):
+                t0 = time_sync()
+                model(im)
+                if i >= 2:  # after 2 warmup batches
+                    d.append(time_sync() - t0)
+        ms = [np.median(d) / batch_size * 1E3 for d in dt]  # median ms per page
+        y.append([f'{w}x{h}', *(f'{s[0]}x{s[1]}' for s in shapes), *(round(x, 1) for x in ms), round(ms[0] / ms[1], 2)])
+
+    # Print results
+    py = pd.DataFrame(y, columns=['Page (w x h)', 'Square', 'Rect', 'Square (ms)', 'Rect (ms)', 'Speedup'])
+    LOGGER.info(f'\nPage benchmarks complete ({time.time() - t:.2f}s), batch size {batch_size}, {device}')
+    LOGGER.info(str(py))
+    return py
+
+
 def parse_opt():
     parser = argparse.ArgumentParser()
     parser.add_argument('--weights', type=str, default=ROOT / 'yolov5s.pt', help='weights path')
@@ -135,13 +176,18 @@ def parse_opt():
     parser.add_argument('--half', action='store_true', help='use FP16 half-precision inference')
     parser.add_argument('--test', action='store_true', help='test exports only')
     parser.add_argument('--pt-only', action='store_true', help='test PyTorch only')
+    parser.add_argument('--pages', action='store_true', help='benchmark square vs rectangular inference of pages')
     opt = parser.parse_args()
     print_args(vars(opt))
     return opt
 
 
 def main(opt):
-    test(**vars(opt)) if opt.test else run(**vars(opt))
+    if opt.pages:
+        pages(opt.weights, opt.imgsz, opt.batch_size, opt.device, opt.half)
+    else:
+        del opt.pages
+        test(**vars(opt)) if opt.test else run(**vars(opt))
 
 
 if __name__ == "__main__":
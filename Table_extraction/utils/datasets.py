@@ -11,6 +11,7 @@ import os
 import random
 import shutil
 import time
+from collections import deque
 from itertools import repeat
 from multiprocessing.pool import Pool, ThreadPool
 from pathlib import Path
@@ -35,6 +36,7 @@ from utils.torch_utils import torch_distributed_zero_first
 HELP_URL = 'https://github.com/ultralytics/yolov5/wiki/Train-Custom-Data'
 IMG_FORMATS = 'bmp', 'dng', 'jpeg', 'jpg', 'mpo', 'png', 'tif', 'tiff', 'webp'  # include image suffixes
 VID_FORMATS = 'asf', 'avi', 'gif', 'm4v', 'mkv', 'mov', 'mp4', 'mpeg', 'mpg', 'ts', 'wmv'  # include video suffixes
+PDF_FORMATS = 'pdf',  # include document suffixes
 BAR_FORMAT = '{l_bar}{bar:10}{r_bar}{bar:-10b}'  # tqdm bar format
 LOCAL_RANK = int(os.getenv('LOCAL_RANK', -1))  # https://pytorch.org/docs/stable/elastic/run.html
 
@@ -257,6 +259,264 @@ class LoadImages:
         return self.nf  # number of files
 
 
+class LoadImagesPrefetch(LoadImages):
+    # YOLOv5 prefetching image dataloader, i.e. `python detect.py --source path/ --prefetch 8`
+    def __init__(self, path, img_size=640, stride=32, auto=True, prefetch=8, workers=None, pin_memory=False):
+        # Reads and letterboxes the next `prefetch` images in a thread pool while the model runs on the current one
+        self.pool, self.queue = None, deque()  # before LoadImages may raise, for __del__
+        super().__init__(path, img_size=img_size, stride=stride, auto=auto)
+        if any(self.video_flag):
+            LOGGER.warning('WARNING: --prefetch is only supported for images, reading on the main thread')
+        self.prefetch = 0 if any(self.video_flag) else max(prefetch, 1)  # 0 reads as LoadImages
+        self.workers = min(workers or NUM_THREADS, self.prefetch)
+        self.pin_memory = pin_memory and torch.cuda.is_available()  # page-locked host memory for async H2D copy
+        self.load_times, self.wait_time = [], 0.0  # seconds spent loading each image, waiting (main thread)
+
+    def __iter__(self):
+        if not self.prefetch:
+            return super().__iter__()
+        self.close()  # reads ahead of a previous iteration
+        self.count = 0
+        self.pool = ThreadPool(self.workers)
+        self.queue = deque(self.pool.apply_async(self.load, (i,)) for i in range(min(self.prefetch, self.nf)))
+        return self
+
+    def __next__(self):
+        if not self.prefetch:
+            return super().__next__()
+        if self.count == self.nf:
+            self.close()
+            raise StopIteration
+        t = time.time()
+        item = self.queue.popleft().get()  # in file order
+        self.wait_time += time.time() - t
+        if self.count + self.prefetch < self.nf:
+            self.queue.append(self.pool.apply_async(self.load, (self.count + self.prefetch,)))
+        self.count += 1
+        return item
+
+    def load(self, i):
+        t = time.time()
+        path = self.files[i]
+        img0 = cv2.imread(path)  # BGR
+        assert img0 is not None, f'Image Not Found {path}'
+        img = letterbox(img0, self.img_size, stride=self.stride, auto=self.auto)[0]
+        img = np.ascontiguousarray(img.transpose((2, 0, 1))[::-1])  # HWC to CHW, BGR to RGB
+        if self.pin_memory:
+            img = torch.from_numpy(img).pin_memory()
+        self.load_times.append(time.time() - t)
+        return path, img, img0, None, f'image {i + 1}/{self.nf} {path}: '
+
+    def close(self):
+        # Drops the pending reads and stops the threads, i.e. after breaking out of the loop
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool, self.queue = None, deque()
+
+    def __del__(self):
+        self.close()
+
+
+class LoadPDF:
+    # YOLOv5 PDF dataloader, i.e. `python detect.py --source doc.pdf/path/ --dpi 200 --pdf-workers 4`
+    def __init__(self, path, img_size=640, stride=32, auto=True, dpi=200, workers=0, prefetch=None):
+        # Rasterizes the pages of the PDFs lazily at `dpi`, in memory, in `workers` processes (0 for the main thread)
+        self.pool = None  # before the checks below may raise, for __del__
+        p = str(Path(path).resolve())  # os-agnostic absolute path
+        if '*' in p:
+            files = sorted(glob.glob(p, recursive=True))  # glob
+        elif os.path.isdir(p):
+            files = sorted(glob.glob(os.path.join(p, '*.*')))  # dir
+        elif os.path.isfile(p):
+            files = [p]  # files
+        else:
+            raise Exception(f'ERROR: {p} does not exist')
+
+        self.docs = [x for x in files if x.split('.')[-1].lower() in PDF_FORMATS]
+        assert self.docs, f'No PDFs found in {p}'
+        self.backend = pdf_backend()  # PyMuPDF module name, None for pdf2image
+        self.pages = [(f, i) for f in self.docs for i in range(pdf_pages(f, self.backend))]  # (document, page index)
+        self.img_size = img_size
+        self.stride = stride
+        self.auto = auto
+        self.dpi = dpi
+        self.workers = workers
+        self.prefetch = prefetch or 2 * workers  # pages rendered ahead
+        self.nf = len(self.pages)  # number of pages
+        self.mode = 'image'
+        self.cap = None
+        self.skipped = sum(x.split('.')[-1].lower() in IMG_FORMATS + VID_FORMATS for x in files)  # not read
+
+    def __iter__(self):
+        self.close()  # pages rendered ahead by a previous iteration
+        self.count = 0
+        if self.workers:
+            self.pool = Pool(self.workers, initializer=init_pdf_worker)
+            self.queue = deque(self.pool.apply_async(load_pdf_page, (self.task(i),))
+                               for i in range(min(self.prefetch, self.nf)))
+        return self
+
+    def __next__(self):
+        if self.count == self.nf:
+            self.close()
+            raise StopIteration
+        if self.workers:
+            img, img0 = self.queue.popleft().get()  # in page order
+            if self.count + self.prefetch < self.nf:
+                self.queue.append(self.pool.apply_async(load_pdf_page, (self.task(self.count + self.prefetch),)))
+        else:
+            img, img0 = load_pdf_page(self.task(self.count))
+        f, i = self.pages[self.count]
+        self.count += 1
+        path = str(Path(f).with_name(f'{Path(f).stem}_{i + 1}.png'))  # one image name per page, i.e. doc_1.png
+        return path, img, img0, self.cap, f'pdf {self.count}/{self.nf} {f} page {i + 1}: '
+
+    def task(self, n):
+        f, i = self.pages[n]
+        return f, i, self.dpi, self.img_size, self.stride, self.auto, self.backend
+
+    def close(self):
+        # Drops the pending pages and stops the worker processes, i.e. after breaking out of the loop
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    def __del__(self):
+        self.close()
+
+    def __len__(self):
+        return self.nf  # number of pages
+
+
+def pdf_pages(file, backend=None):
+    # Returns the number of pages of a PDF, with the pdf_backend() `backend`
+    if backend:
+        return len(open_pdf(file, backend))
+    from pdf2image import pdfinfo_from_path
+    return int(pdfinfo_from_path(file)['Pages'])
+
+
+def render_pdf_page(file, page, dpi=200, backend=None):
+    # Rasterizes page `page` (0-based) of a PDF at `dpi` into a BGR image, without writing it to disk
+    if backend:
+        pix = open_pdf(file, backend)[page].get_pixmap(dpi=dpi, alpha=False)  # RGB
+        im = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    else:  # poppler, read from pdftoppm stdout
+        from pdf2image import convert_from_path
+        im = np.asarray(convert_from_path(file, dpi=dpi, first_page=page + 1, last_page=page + 1)[0].convert('RGB'))
+    return np.ascontiguousarray(im[..., ::-1])  # RGB to BGR
+
+
+def load_pdf_page(args):
+    # Rasterizes and letterboxes one PDF page, in LoadPDF or its worker processes
+    file, page, dpi, img_size, stride, auto, backend = args
+    img0 = render_pdf_page(file, page, dpi, backend)
+    img = letterbox(img0, img_size, stride=stride, auto=auto)[0]
+    img = np.ascontiguousarray(img.transpose((2, 0, 1))[::-1])  # HWC to CHW, BGR to RGB
+    return img, img0
+
+
+def init_pdf_worker():
+    # Drops the documents inherited from the parent on fork, each LoadPDF worker process opens its own
+    _PDF_DOCS.clear()
+
+
+def pdf_backend():
+    # Returns the PyMuPDF module name if installed (in-process rendering), else None for pdf2image (poppler)
+    for name in 'pymupdf', 'fitz':  # PyMuPDF >= 1.24, older PyMuPDF
+        try:
+            __import__(name)
+            return name
+        except ImportError:
+            pass
+    check_requirements(('pdf2image',))
+    return None
+
+
+_PDF_DOCS = {}  # open PyMuPDF documents of this process
+
+
+def open_pdf(file, backend='pymupdf'):
+    if file not in _PDF_DOCS:
+        _PDF_DOCS[file] = __import__(backend).open(file)
+    return _PDF_DOCS[file]
+
+
+class LoadBatches:
+    # YOLOv5 batched image dataloader, i.e. `python detect.py --source path/ --batch-size 16`
+    def __init__(self, dataset, batch_size=16):
+        # Batches consecutive images of the same letterboxed shape, so each image is padded exactly as with
+        # batch size 1. A change of shape (i.e. a page of another size) starts a new batch.
+        assert not any(getattr(dataset, 'video_flag', [])), 'Batched inference supports images only'
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.mode = 'image'
+
+    def __iter__(self):
+        batch = []
+        for item in self.dataset:
+            if batch and (len(batch) == self.batch_size or item[1].shape != batch[0][1].shape):
+                yield self.collate(batch)
+                batch = []
+            batch.append(item)
+        if batch:
+            yield self.collate(batch)
+
+    @staticmethod
+    def collate(batch):
+        path, img, img0, cap, s = zip(*batch)
+        if isinstance(img[0], torch.Tensor):  # pinned by LoadImagesPrefetch, stack into pinned memory
+            out = torch.empty((len(img), *img[0].shape), dtype=img[0].dtype, pin_memory=img[0].is_pinned())
+            return list(path), torch.stack(img, 0, out=out), list(img0), None, list(s)
+        return list(path), np.stack(img, 0), list(img0), None, list(s)
+
+    def __len__(self):
+        return len(self.dataset)  # number of images
+
+
+class LoadRectBatches(LoadImages):
+    # YOLOv5 rectangular batched image dataloader, i.e. `python detect.py --source path/ --batch-size 16 --rect`
+    def __init__(self, path, img_size=640, stride=32, batch_size=16):
+        # Sorts the images by aspect ratio, read from their headers, into batches of `batch_size` (as the rect batches
+        # of LoadImagesAndLabels), each letterboxed to the smallest stride-multiple shape that holds all its images
+        # at the scale of batch size 1, so tall pages are not padded to a square
+        super().__init__(path, img_size=img_size, stride=stride, auto=False)
+        assert not any(self.video_flag), 'Rectangular batches support images only'
+        self.batch_size = batch_size
+        self.shapes = np.array([exif_size(Image.open(f))[::-1] for f in self.files])  # hw
+        irect = (self.shapes[:, 0] / self.shapes[:, 1]).argsort(kind='stable')  # sort by aspect ratio
+        self.batches = [irect[i:i + batch_size] for i in range(0, self.nf, batch_size)]  # image indices
+        self.batch_shapes = [rect_shape(self.shapes[b], img_size, stride) for b in self.batches]  # hw
+
+    def __iter__(self):
+        self.count = 0  # batches
+        return self
+
+    def __next__(self):
+        if self.count == len(self.batches):
+            raise StopIteration
+        batch, shape = self.batches[self.count], self.batch_shapes[self.count]
+        self.count += 1
+        path, img, img0, s = [], [], [], []
+        for i in batch:
+            im0 = cv2.imread(self.files[i])  # BGR
+            assert im0 is not None, f'Image Not Found {self.files[i]}'
+            im = letterbox(im0, shape, stride=self.stride, auto=False)[0]
+            path.append(self.files[i])
+            img.append(im.transpose((2, 0, 1))[::-1])  # HWC to CHW, BGR to RGB
+            img0.append(im0)
+            s.append(f'image {i + 1}/{self.nf} {self.files[i]}: ')
+        return path, np.ascontiguousarray(np.stack(img, 0)), img0, None, s
+
+
+def rect_shape(shapes, img_size=640, stride=32):
+    # Returns the smallest stride-multiple (h, w) holding images of `shapes` (n, 2) hw resized as by letterbox()
+    h, w = (img_size, img_size) if isinstance(img_size, int) else img_size
+    r = np.minimum(h / shapes[:, 0], w / shapes[:, 1])  # scale ratio (new / old)
+    new_unpad = np.round(shapes * r[:, None])  # hw
+    return tuple(int(x) for x in np.ceil(new_unpad.max(0) / stride) * stride)
+
+
 class LoadWebcam:  # for inference
     # YOLOv5 local webcam dataloader, i.e. `python detect.py --source 0`
     def __init__(self, pipe='0', img_size=640, stride=32):
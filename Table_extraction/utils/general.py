@@ -741,15 +741,25 @@ def non_max_suppression(prediction,
                         agnostic=False,
                         multi_label=False,
                         labels=(),
-                        max_det=300):
+                        max_det=300,
+                        batched=False,
+                        time_limit=None):
     """Non-Maximum Suppression (NMS) on inference results to reject overlapping bounding boxes
 
+    batched=True runs one NMS over all images of the batch (see batched_non_max_suppression), with the same results
+    time_limit: seconds to quit the per-image loop after, default 0.1 + 0.03 * batch size, 0 for no limit
+    prediction (bs,n,5) [xywh, conf] of a single-class Detect(fused=True) skips the class logic
+
     Returns:
          list of detections, on (n,6) tensor per image [xyxy, conf, cls]
     """
+    if batched:
+        return batched_non_max_suppression(prediction, conf_thres, iou_thres, classes, agnostic, multi_label, labels,
+                                           max_det)
 
     bs = prediction.shape[0]  # batch size
-    nc = prediction.shape[2] - 5  # number of classes
+    fused = prediction.shape[2] == 5  # single-class conf = obj_conf * cls_conf, from Detect.fused
+    nc = prediction.shape[2] - 5 or 1  # number of classes
     xc = prediction[..., 4] > conf_thres  # candidates
 
     # Checks
@@ -760,7 +770,7 @@ def non_max_suppression(prediction,
     # min_wh = 2  # (pixels) minimum box width and height
     max_wh = 7680  # (pixels) maximum box width and height
     max_nms = 30000  # maximum number of boxes into torchvision.ops.nms()
-    time_limit = 0.1 + 0.03 * bs  # seconds to quit after
+    time_limit = 0.1 + 0.03 * bs if time_limit is None else time_limit  # seconds to quit after
     redundant = True  # require redundant detections
     multi_label &= nc > 1  # multiple labels per box (adds 0.5ms/img)
     merge = False  # use merge-NMS
@@ -775,10 +785,11 @@ def non_max_suppression(prediction,
         # Cat apriori labels if autolabelling
         if labels and len(labels[xi]):
             lb = labels[xi]
-            v = torch.zeros((len(lb), nc + 5), device=x.device)
+            v = torch.zeros((len(lb), prediction.shape[2]), device=x.device)
             v[:, :4] = lb[:, 1:5]  # box
             v[:, 4] = 1.0  # conf
-            v[range(len(lb)), lb[:, 0].long() + 5] = 1.0  # cls
+            if not fused:
+                v[range(len(lb)), lb[:, 0].long() + 5] = 1.0  # cls
             x = torch.cat((x, v), 0)
 
         # If none remain process next image
@@ -786,13 +797,17 @@ def non_max_suppression(prediction,
             continue
 
         # Compute conf
-        x[:, 5:] *= x[:, 4:5]  # conf = obj_conf * cls_conf
+        if not fused:
+            x[:, 5:] *= x[:, 4:5]  # conf = obj_conf * cls_conf
 
         # Box (center x, center y, width, height) to (x1, y1, x2, y2)
         box = xywh2xyxy(x[:, :4])
 
         # Detections matrix nx6 (xyxy, conf, cls)
-        if multi_label:
+        if fused:  # single class, conf already fused
+            conf = x[:, 4:5]
+            x = torch.cat((box, conf, torch.zeros_like(conf)), 1)[conf.view(-1) > conf_thres]
+        elif multi_label:
             i, j = (x[:, 5:] > conf_thres).nonzero(as_tuple=False).T
             x = torch.cat((box[i], x[i, j + 5, None], j[:, None].float()), 1)
         else:  # best class only
@@ -829,13 +844,128 @@ def non_max_suppression(prediction,
                 i = i[iou.sum(1) > 1]  # require redundancy
 
         output[xi] = x[i]
-        if (time.time() - t) > time_limit:
+        if time_limit and (time.time() - t) > time_limit:
             LOGGER.warning(f'WARNING: NMS time limit {time_limit:.3f}s exceeded')
             break  # time limit exceeded
 
     return output
 
 
+def batched_non_max_suppression(prediction,
+                                conf_thres=0.25,
+                                iou_thres=0.45,
+                                classes=None,
+                                agnostic=False,
+                                multi_label=False,
+                                labels=(),
+                                max_det=300):
+    """Non-Maximum Suppression (NMS) on a batch of inference results, as non_max_suppression, with one NMS call
+
+    Candidates of all images are filtered together and offset by image (and class) into disjoint regions, so a single
+    torchvision.ops.nms() replaces the per-image loop. Offsets are added in float64, where they are exact, to keep the
+    IoU of every pair of boxes as in the per-image loop. On CPU, where NMS is quadratic in the number of boxes, large
+    batches of candidates run one NMS per image instead. Single-class models skip the class logic. No time limit.
+
+    Returns:
+         list of detections, on (n,6) tensor per image [xyxy, conf, cls]
+    """
+
+    bs = prediction.shape[0]  # batch size
+    fused = prediction.shape[2] == 5  # single-class conf = obj_conf * cls_conf, from Detect.fused
+    nc = prediction.shape[2] - 5 or 1  # number of classes
+    xc = prediction[..., 4] > conf_thres  # candidates
+
+    # Checks
+    assert 0 <= conf_thres <= 1, f'Invalid Confidence threshold {conf_thres}, valid values are between 0.0 and 1.0'
+    assert 0 <= iou_thres <= 1, f'Invalid IoU {iou_thres}, valid values are between 0.0 and 1.0'
+
+    # Settings
+    max_wh = 7680  # (pixels) maximum box width and height
+    max_nms = 30000  # maximum number of boxes per image into torchvision.ops.nms()
+    max_cpu = 2000  # maximum number of boxes into a single torchvision.ops.nms() on CPU
+    multi_label &= nc > 1  # multiple labels per box
+    device = prediction.device
+
+    bi, ai = xc.nonzero(as_tuple=True)  # image index, anchor index
+    x = prediction[bi, ai]  # confidence
+
+    # Cat apriori labels if autolabelling
+    if labels and any(len(lb) for lb in labels):
+        v = torch.zeros((sum(len(lb) for lb in labels), prediction.shape[2]), device=device)
+        lb = torch.cat([lb for lb in labels if len(lb)], 0)
+        v[:, :4] = lb[:, 1:5]  # box
+        v[:, 4] = 1.0  # conf
+        if not fused:
+            v[range(len(lb)), lb[:, 0].long() + 5] = 1.0  # cls
+        vi = torch.cat([torch.full((len(lb),), xi, device=device) for xi, lb in enumerate(labels) if len(lb)])
+        order = torch.sort(torch.cat((bi, vi)), stable=True)[1]  # labels after the candidates of their image
+        x, bi = torch.cat((x, v), 0)[order], torch.cat((bi, vi))[order]
+
+    output = [torch.zeros((0, 6), device=device)] * bs
+    if not x.shape[0]:
+        return output
+
+    # Detections matrix nx6 (xyxy, conf, cls)
+    box = xywh2xyxy(x[:, :4])  # center x, center y, width, height to x1, y1, x2, y2
+    if nc == 1:  # single class, conf = obj_conf * cls_conf
+        conf = x[:, 4:5] if fused else x[:, 5:6] * x[:, 4:5]
+        x = torch.cat((box, conf, torch.zeros_like(conf)), 1)
+        keep = conf.view(-1) > conf_thres
+    elif multi_label:
+        x[:, 5:] *= x[:, 4:5]  # conf = obj_conf * cls_conf
+        i, j = (x[:, 5:] > conf_thres).nonzero(as_tuple=False).T
+        x, bi = torch.cat((box[i], x[i, j + 5, None], j[:, None].float()), 1), bi[i]
+        keep = torch.ones(len(x), dtype=torch.bool, device=device)
+    else:  # best class only
+        x[:, 5:] *= x[:, 4:5]  # conf = obj_conf * cls_conf
+        conf, j = x[:, 5:].max(1, keepdim=True)
+        x = torch.cat((box, conf, j.float()), 1)
+        keep = conf.view(-1) > conf_thres
+
+    # Filter by class
+    if classes is not None:
+        keep &= (x[:, 5:6] == torch.tensor(classes, device=device)).any(1)
+    x, bi = x[keep], bi[keep]
+    if not x.shape[0]:  # no boxes
+        return output
+
+    # Excess boxes, keep the most confident per image
+    n = torch.bincount(bi, minlength=bs)  # boxes per image
+    if n.max() > max_nms:
+        keep = []
+        for xi in range(bs):
+            k = (bi == xi).nonzero(as_tuple=False).view(-1)
+            keep.append(k[x[k, 4].argsort(descending=True)[:max_nms]] if len(k) > max_nms else k)  # sort by confidence
+        keep = torch.cat(keep)
+        x, bi = x[keep], bi[keep]
+
+    # Batched NMS
+    boxes, scores = x[:, :4], x[:, 4]
+    if nc > 1 and not agnostic:
+        boxes = boxes + x[:, 5:6] * max_wh  # boxes (offset by class), as in non_max_suppression
+    if device.type == 'cpu' and len(x) > max_cpu:  # CPU NMS is quadratic in the number of boxes, split by image
+        n = torch.bincount(bi, minlength=bs).tolist()
+        start = [sum(n[:xi]) for xi in range(bs)]  # candidates are sorted by image
+        i = torch.cat([torchvision.ops.nms(boxes[s:s + k], scores[s:s + k], iou_thres) + s for s, k in zip(start, n)])
+    elif bs > 1:
+        offset = bi[:, None].double() * max_wh * (nc + 1)  # image offset, beyond all classes
+        i = torchvision.ops.nms(boxes.double() + offset, scores.double(), iou_thres)  # NMS, by decreasing score
+    else:
+        i = torchvision.ops.nms(boxes, scores, iou_thres)  # NMS
+
+    # Split by image, in order of decreasing score, at most max_det each
+    order = torch.sort(bi[i], stable=True)[1]
+    i = i[order]
+    n = torch.bincount(bi[i], minlength=bs)
+    start = torch.cumsum(n, 0) - n
+    i = i[(torch.arange(len(i), device=device) - start[bi[i]]) < max_det]  # limit detections
+    n = n.clamp(max=max_det).tolist()
+    for xi, d in enumerate(x[i].split(n)):
+        if n[xi]:
+            output[xi] = d
+    return output
+
+
 def strip_optimizer(f='best.pt', s=''):  # from utils.general import *; strip_optimizer()
     # Strip optimizer from 'f' to finalize training, optionally save as 's'
     x = torch.load(f, map_location=torch.device('cpu'))